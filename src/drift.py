@@ -0,0 +1,470 @@
+from __future__ import annotations  # noqa: INP001
+
+import argparse
+import gzip
+import json
+import os
+import re
+import sys
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import TYPE_CHECKING, NamedTuple
+
+from fastdot import Connection, to_dot
+
+if TYPE_CHECKING:
+    from collections.abc import Iterable, Iterator
+
+    Pair = tuple[str | None, str | None]
+
+# A day of gateway logs is tens of GB, so plain files are split into chunks of
+# this many bytes and parsed on every core. Gzipped files cannot be seeked and
+# are parsed whole, one worker per file.
+CHUNK_SIZE = 64 * 1024 * 1024
+
+# ingress-nginx default log format: ``... $request_time [$proxy_upstream_name]
+# [$proxy_alternative_upstream_name] ...``. The time_local field is the only
+# other bracketed one and it contains a space.
+_NGINX_UPSTREAM = re.compile(rb"\s\[([^\]\s]+)\]\s\[")
+# Ingress upstream names look like "<namespace>-<service>-<port>".
+_PORT_SUFFIX = re.compile(r"-\d+$")
+_NORMALIZE = re.compile(r"[\W_]+")
+
+
+class Observed(NamedTuple):
+    """Traffic seen in the logs between two services."""
+
+    source: str
+    target: str
+    count: int
+
+
+class Observation(NamedTuple):
+    """What :func:`observe` found in the logs.
+
+    ``counts`` holds the (kind, source, target) pairs, ``None`` standing for the
+    hub of the log, and ``skipped`` the number of lines of each kind that were
+    not in the expected format and so were not counted.
+    """
+
+    counts: Counter[tuple[str, str | None, str | None]]
+    skipped: Counter[str]
+
+
+class Report(NamedTuple):
+    """Drift between the declared diagram and the observed traffic.
+
+    ``missing`` edges were observed between services of the diagram but are not
+    declared, ``extra`` edges were observed with an endpoint the diagram does
+    not know about, and ``unused`` edges are declared but were never observed.
+    ``shared`` counts the nodes behind each label used by more than one node,
+    whose traffic cannot be told apart; it is not drift by itself.
+    """
+
+    missing: list[Observed]
+    extra: list[Observed]
+    unused: list[Connection]
+    shared: dict[str, int]
+
+    def __bool__(self) -> bool:
+        """Whether any drift was found."""
+        return bool(self.missing or self.extra or self.unused)
+
+
+# ============================================================================ #
+# Log parsers: each returns the (source, target) pairs of a line, ``None``
+# standing for the hub the log was written by (Kong, the ingress controller or
+# the Kafka cluster), or ``None`` itself when the line is not in its format.
+# Logs are not guaranteed to be valid UTF-8, so names are decoded leniently.
+#
+
+
+def _parse_kong(line: bytes) -> list[Pair] | None:
+    # Kong file-log/http-log plugin: one JSON object per line. ``service`` and
+    # ``consumer`` are null for requests that matched no route or were anonymous.
+    try:
+        entry = json.loads(line.decode(errors="replace"))
+    except json.JSONDecodeError:
+        return None
+    if not isinstance(entry, dict):
+        return None
+    pairs: list[Pair] = []
+    consumer = entry.get("consumer") or {}
+    if isinstance(consumer, dict) and consumer.get("username"):
+        pairs.append((str(consumer["username"]), None))
+    service = entry.get("service") or {}
+    if isinstance(service, dict) and service.get("name"):
+        pairs.append((None, str(service["name"])))
+    return pairs
+
+
+def _parse_nginx(line: bytes) -> list[Pair] | None:
+    upstream = _NGINX_UPSTREAM.search(line)
+    if not upstream:
+        return None
+    # "-" is logged for requests answered without an upstream, e.g. redirects.
+    if upstream.group(1) == b"-":
+        return []
+    return [(None, upstream.group(1).decode(errors="replace"))]
+
+
+def _parse_kafka(line: bytes) -> list[Pair] | None:
+    # ``kafka-consumer-groups.sh --describe --all-groups`` output: GROUP, TOPIC,
+    # PARTITION, ... Headers and "has no active members" notes have no partition.
+    fields = line.split(maxsplit=3)
+    if len(fields) > 2 and fields[2].isdigit():  # noqa: PLR2004
+        return [(fields[0].decode(errors="replace"), None)]
+    if fields[0] == b"GROUP" or line.startswith(b"Consumer group "):
+        return []
+    return None
+
+
+PARSERS = {
+    "kong": _parse_kong,
+    "nginx": _parse_nginx,
+    "kafka": _parse_kafka,
+}
+
+# Which edges of its hub each log can show: (outgoing, incoming).
+COVERAGE = {
+    "kong": (True, True),
+    "nginx": (True, False),
+    "kafka": (False, True),
+}
+
+
+class _Chunk(NamedTuple):
+    kind: str
+    path: str
+    start: int
+    end: int | None
+
+
+def _chunks(kind: str, path: Path, chunk_size: int) -> Iterator[_Chunk]:
+    if path.suffix == ".gz":
+        yield _Chunk(kind, str(path), 0, None)
+        return
+    size = path.stat().st_size
+    for start in range(0, max(size, 1), chunk_size):
+        yield _Chunk(kind, str(path), start, min(start + chunk_size, size))
+
+
+def _lines(chunk: _Chunk) -> Iterator[bytes]:
+    """Yield the lines that start inside the chunk."""
+    if chunk.end is None:
+        with gzip.open(chunk.path, "rb") as fh:
+            yield from fh
+        return
+    with Path(chunk.path).open("rb") as fh:
+        position = chunk.start
+        if position:
+            # The line straddling the boundary belongs to the previous chunk.
+            fh.seek(position - 1)
+            position += len(fh.readline()) - 1
+        while position < chunk.end:
+            line = fh.readline()
+            if not line:
+                break
+            position += len(line)
+            yield line
+
+
+def _parse_chunk(chunk: _Chunk) -> Observation:
+    parse = PARSERS[chunk.kind]
+    counts: Counter[Pair] = Counter()
+    skipped = 0
+    for line in _lines(chunk):
+        if line.isspace():
+            continue
+        pairs = parse(line)
+        if pairs is None:
+            skipped += 1
+        else:
+            counts.update(pairs)
+    return Observation(
+        Counter({(chunk.kind, *pair): count for pair, count in counts.items()}),
+        Counter({chunk.kind: skipped}) if skipped else Counter(),
+    )
+
+
+def observe(
+    logs: Iterable[tuple[str, Path]],
+    *,
+    jobs: int | None = None,
+    chunk_size: int = CHUNK_SIZE,
+) -> Observation:
+    """Count the (kind, source, target) pairs found in ``logs`` in parallel.
+
+    :param logs: Pairs of log kind (a key of ``PARSERS``) and file path.
+    :param jobs: Worker processes, defaulting to the number of cores.
+    :param chunk_size: Bytes of an uncompressed file parsed by one worker.
+    """
+    chunks = [chunk for kind, path in logs for chunk in _chunks(kind, path, chunk_size)]
+    observation = Observation(Counter(), Counter())
+    if not chunks:
+        return observation
+    with ProcessPoolExecutor(max_workers=jobs) as pool:
+        for partial in pool.map(_parse_chunk, chunks):
+            observation.counts.update(partial.counts)
+            observation.skipped.update(partial.skipped)
+    return observation
+
+
+# ============================================================================ #
+# Comparison against the diagram.
+#
+
+
+def _normalize(name: str) -> str:
+    return _NORMALIZE.sub("", name).lower()
+
+
+class _Resolver:
+    """Map names found in logs to node labels of the diagram."""
+
+    def __init__(self, labels: Iterable[str], aliases: dict[str, str]) -> None:
+        self.labels: dict[str, str] = {}
+        # Labels used by several nodes, with how many; connections only carry
+        # labels, so the traffic of those nodes cannot be told apart.
+        self.shared: dict[str, int] = {}
+        counts = Counter(_normalize(label) for label in labels)
+        for label in labels:
+            key = _normalize(label)
+            if counts[key] > 1 and key not in self.labels:
+                self.shared[label] = counts[key]
+            self.labels[key] = label
+        self.aliases = {
+            _normalize(name): self.labels.get(_normalize(label), label)
+            for name, label in aliases.items()
+        }
+
+    def __call__(self, name: str, kind: str | None = None) -> str | None:
+        candidates = [name]
+        if kind == "nginx":
+            # Also try the name without the namespace and port ingress-nginx
+            # adds to upstream names; Kong and Kafka names are used verbatim.
+            parts = _PORT_SUFFIX.sub("", name).split("-")
+            candidates += ["-".join(parts[i:]) for i in range(len(parts))]
+        for candidate in candidates:
+            key = _normalize(candidate)
+            if key in self.aliases:
+                return self.aliases[key]
+            if key in self.labels:
+                return self.labels[key]
+        return None
+
+
+def _pairs(edge: Connection) -> set[tuple[str, str]]:
+    """Return the (source, target) pairs of traffic an edge declares."""
+    pairs = set()
+    if edge.direction in {"forward", "both", "none"}:
+        pairs.add((edge.tail, edge.head))
+    if edge.direction in {"back", "both", "none"}:
+        pairs.add((edge.head, edge.tail))
+    return pairs
+
+
+def _covered(
+    edge: Connection, hubs: set[str], outgoing: set[str], incoming: set[str]
+) -> bool:
+    """Whether the logs of the ``outgoing`` and ``incoming`` hubs see ``edge``."""
+    # Traffic between two hubs, e.g. Kong calling the ingress, is logged as
+    # coming from or going to the hub itself, never as an edge between them.
+    if edge.tail in hubs and edge.head in hubs:
+        return False
+    # A dir=none edge does not tell which way traffic flows, so it is only
+    # covered by the logs of a hub on the side it is drawn from.
+    if edge.direction == "none":
+        return edge.tail in outgoing or edge.head in incoming
+    return any(tail in outgoing or head in incoming for tail, head in _pairs(edge))
+
+
+def compare(
+    nodes: Iterable[str],
+    edges: Iterable[Connection],
+    counts: Counter[tuple[str, str | None, str | None]],
+    hubs: dict[str, str],
+    aliases: dict[str, str] | None = None,
+) -> Report:
+    """Compare declared ``edges`` against the observed ``counts``.
+
+    :param hubs: Node label of the hub behind each log kind, e.g.
+        ``{"kong": "Kong"}``.
+    :param aliases: Node label of log names that do not match one by themselves.
+    :raises ValueError: If the hub of an observed log kind is not in the diagram.
+    """
+    resolve = _Resolver(list(nodes), aliases or {})
+    for kind in sorted({kind for kind, _, _ in counts}):
+        if resolve(hubs[kind]) is None:
+            msg = f"{kind} hub {hubs[kind]!r} is not a node of the diagram"
+            raise ValueError(msg)
+    declared = {edge: _pairs(edge) for edge in edges}
+    pairs = {pair for edge_pairs in declared.values() for pair in edge_pairs}
+
+    missing: Counter[tuple[str, str]] = Counter()
+    extra: Counter[tuple[str, str]] = Counter()
+    seen: set[tuple[str, str]] = set()
+    for (kind, source, target), count in counts.items():
+        tail_name = hubs[kind] if source is None else source
+        head_name = hubs[kind] if target is None else target
+        tail, head = resolve(tail_name, kind), resolve(head_name, kind)
+        if tail is None or head is None:
+            extra[tail or tail_name, head or head_name] += count
+        elif (tail, head) in pairs:
+            seen.add((tail, head))
+        else:
+            missing[tail, head] += count
+
+    # Only edges of a hub are covered by its logs; the rest, such as services
+    # talking to their databases, cannot be observed at all.
+    hub_labels = {resolve(hub) for hub in hubs.values()} - {None}
+    outgoing, incoming = set(), set()
+    for kind in {kind for kind, _, _ in counts}:
+        hub = resolve(hubs[kind])
+        if COVERAGE[kind][0]:
+            outgoing.add(hub)
+        if COVERAGE[kind][1]:
+            incoming.add(hub)
+    unused = [
+        edge
+        for edge, edge_pairs in declared.items()
+        if _covered(edge, hub_labels, outgoing, incoming) and not edge_pairs & seen
+    ]
+    return Report(
+        [Observed(*pair, count) for pair, count in missing.most_common()],
+        [Observed(*pair, count) for pair, count in extra.most_common()],
+        unused,
+        resolve.shared,
+    )
+
+
+def _flat(label: str) -> str:
+    return " ".join(label.split())
+
+
+def format_report(report: Report) -> str:
+    """Return a plain-text listing of the drift."""
+    lines = []
+    for title, observed in (
+        ("missing (observed, not declared)", report.missing),
+        ("extra (observed, not in the diagram)", report.extra),
+    ):
+        lines.append(f"{title}: {len(observed)}")
+        lines += [
+            f"  {_flat(edge.source)} -> {_flat(edge.target)}  {edge.count}"
+            for edge in observed
+        ]
+    lines.append(f"unused (declared, not observed): {len(report.unused)}")
+    lines += [f"  {_flat(edge.tail)} -> {_flat(edge.head)}" for edge in report.unused]
+    return "\n".join(lines) + "\n"
+
+
+def render_report(report: Report, filename: str, outformat: str = "png") -> str:
+    """Render the drift as a graph and return the path of the output file."""
+    from graphviz import Digraph  # noqa: PLC0415 - only needed with --render
+
+    dot = Digraph("drift", filename=filename)
+    dot.graph_attr.update(rankdir="LR", label="Declared vs observed", labelloc="t")
+    dot.node_attr.update(shape="box", style="rounded", fontname="Sans-Serif")
+    ids: dict[str, str] = {}
+
+    def node(label: str) -> str:
+        # Labels may hold characters with a meaning in DOT node ids, like ":".
+        if label not in ids:
+            ids[label] = f"n{len(ids)}"
+            dot.node(ids[label], label)
+        return ids[label]
+
+    for edge in report.missing:
+        dot.edge(
+            node(edge.source), node(edge.target), str(edge.count), color="firebrick"
+        )
+    for edge in report.extra:
+        dot.edge(
+            node(edge.source),
+            node(edge.target),
+            str(edge.count),
+            color="orange",
+            style="dashed",
+        )
+    for edge in report.unused:
+        dot.edge(node(edge.tail), node(edge.head), color="gray", style="dotted")
+    return dot.render(format=outformat, cleanup=True)
+
+
+def main(argv: list[str] | None = None) -> int:
+    """Report drift between a diagram script and the traffic seen in logs."""
+    parser = argparse.ArgumentParser(description=main.__doc__)
+    parser.add_argument("script", type=Path, help="diagram script, e.g. arquitetura.py")
+    for kind, kind_help in (
+        ("kong", "Kong file-log/http-log JSON access log"),
+        ("nginx", "ingress-nginx access log"),
+        ("kafka", "kafka-consumer-groups.sh --describe output"),
+    ):
+        parser.add_argument(
+            f"--{kind}",
+            type=Path,
+            action="append",
+            default=[],
+            help=f"{kind_help}, possibly gzipped (repeatable)",
+        )
+    parser.add_argument("--kong-node", default="Kong", help="label of the Kong node")
+    parser.add_argument(
+        "--nginx-node",
+        default="Nginx Ingress Controller",
+        help="label of the ingress controller node",
+    )
+    parser.add_argument(
+        "--kafka-node", default="Broker 01", help="label of the Kafka node"
+    )
+    parser.add_argument(
+        "--alias",
+        action="append",
+        default=[],
+        metavar="NAME=LABEL",
+        help="map a service name found in the logs to a node label (repeatable)",
+    )
+    parser.add_argument("-j", "--jobs", type=int, help="worker processes")
+    parser.add_argument("--render", metavar="FILENAME", help="also render the drift")
+    parser.add_argument("--format", default="png", help="format used by --render")
+    args = parser.parse_args(argv)
+
+    aliases = {}
+    for alias in args.alias:
+        name, sep, label = alias.partition("=")
+        if not sep:
+            parser.error(f"--alias expects NAME=LABEL, got {alias!r}")
+        aliases[name] = label
+    logs = [(kind, path) for kind in PARSERS for path in getattr(args, kind)]
+    if not logs:
+        parser.error("at least one of --kong, --nginx or --kafka is required")
+
+    compiled = to_dot(args.script)
+    nodes = [node for diagram in compiled for node in diagram.nodes]
+    edges = [edge for diagram in compiled for edge in diagram.edges]
+    hubs = {kind: getattr(args, f"{kind}_node") for kind in PARSERS}
+    # Checked before the logs are parsed, which can take a while.
+    resolve = _Resolver(nodes, aliases)
+    for kind in dict(logs):
+        if resolve(hubs[kind]) is None:
+            parser.error(f"--{kind}-node {hubs[kind]!r} is not a node of {args.script}")
+    observation = observe(logs, jobs=args.jobs)
+    report = compare(nodes, edges, observation.counts, hubs, aliases)
+
+    for label, count in report.shared.items():
+        sys.stderr.write(
+            f"warning: {count} nodes are labeled {_flat(label)!r}; "
+            "their traffic cannot be told apart\n"
+        )
+    for kind, skipped in sorted(observation.skipped.items()):
+        sys.stderr.write(f"warning: skipped {skipped} unrecognized {kind} lines\n")
+    sys.stdout.write(format_report(report))
+    if args.render:
+        output = render_report(report, args.render, args.format)
+        sys.stdout.write(f"rendered {os.fspath(output)}\n")
+    return 1 if report else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,942 @@
+from __future__ import annotations  # noqa: INP001
+
+import argparse
+import ast
+import functools
+import importlib.util
+import operator
+import os
+import re
+import runpy
+import sys
+import uuid
+from collections import ChainMap
+from pathlib import Path
+from typing import Any, NamedTuple
+
+# https://www.graphviz.org/doc/info/lang.html
+_ID = re.compile(r"([a-zA-Z_][a-zA-Z0-9_]*|-?(\.[0-9]+|[0-9]+(\.[0-9]*)?))$")
+_HTML = re.compile(r"<.*>$", re.DOTALL)
+_KEYWORDS = {"node", "edge", "graph", "digraph", "subgraph", "strict"}
+_QUOTES = re.compile(r'(?P<backslashes>(?:\\{2})*)\\?(?P<quote>")')
+
+_OPERATORS = {
+    ast.RShift: operator.rshift,
+    ast.LShift: operator.lshift,
+    ast.Sub: operator.sub,
+    ast.Add: operator.add,
+}
+_COMPARISONS = {ast.Eq: operator.eq, ast.NotEq: operator.ne}
+
+
+class UnsupportedError(Exception):
+    """Raised for script constructs that cannot be compiled statically."""
+
+    def __init__(self, node: ast.AST | None, reason: str) -> None:
+        """Record the offending node so the error can point at its line."""
+        self.lineno = getattr(node, "lineno", None)
+        super().__init__(reason)
+
+
+class Connection(NamedTuple):
+    """An edge declared by a script, between node labels."""
+
+    tail: str
+    head: str
+    direction: str
+
+
+class Compiled(NamedTuple):
+    """The DOT source of one diagram declared by a script."""
+
+    filename: str
+    source: str
+    nodes: tuple[str, ...] = ()
+    edges: tuple[Connection, ...] = ()
+
+
+def _quote(value: object) -> str:
+    """Quote ``value`` as a DOT identifier, the same way ``graphviz`` does."""
+    if not isinstance(value, str):
+        msg = f"attribute values must be strings, got {value!r}"
+        raise TypeError(msg)
+    if _HTML.match(value):
+        return value
+    if not _ID.match(value) or value.lower() in _KEYWORDS:
+        escaped = _QUOTES.sub(r"\g<backslashes>\\\g<quote>", value)
+        return f'"{escaped}"'
+    return value
+
+
+def _attr_list(attrs: dict[str, Any], label: str | None = None) -> str:
+    items = [f"label={_quote(label)}"] if label is not None else []
+    items += [
+        f"{_quote(k)}={_quote(v)}" for k, v in sorted(attrs.items()) if v is not None
+    ]
+    return f" [{' '.join(items)}]" if items else ""
+
+
+# ============================================================================ #
+# Static view of the installed ``diagrams`` package.
+#
+
+
+class _Class(NamedTuple):
+    name: str
+    bases: list[str]
+    attrs: dict[str, Any]
+
+
+class _Library:
+    """Class attributes of ``diagrams`` read from its sources, never imported."""
+
+    def __init__(self) -> None:
+        spec = importlib.util.find_spec("diagrams")
+        if spec is None or not spec.submodule_search_locations:
+            raise UnsupportedError(None, "diagrams is not installed")
+        self.package = Path(next(iter(spec.submodule_search_locations)))
+        self._modules: dict[str, tuple[dict[str, _Class], dict[str, str]]] = {}
+
+    def _path(self, module: str) -> Path:
+        path = self.package.parent.joinpath(*module.split("."))
+        return path / "__init__.py" if path.is_dir() else path.with_suffix(".py")
+
+    def _module(self, module: str) -> tuple[dict[str, _Class], dict[str, str]]:
+        """Return the classes of ``module`` and where its other names come from."""
+        if module in self._modules:
+            return self._modules[module]
+        path = self._path(module)
+        if not path.is_file():
+            raise UnsupportedError(None, f"{module} is not part of diagrams")
+        package = module if path.name == "__init__.py" else module.rpartition(".")[0]
+        classes: dict[str, _Class] = {}
+        names: dict[str, str] = {}
+        for stmt in ast.parse(path.read_text(encoding="utf-8")).body:
+            if isinstance(stmt, ast.ClassDef):
+                bases = [base.id for base in stmt.bases if isinstance(base, ast.Name)]
+                classes[stmt.name] = _Class(stmt.name, bases, _constants(stmt.body))
+            elif isinstance(stmt, ast.ImportFrom):
+                source = stmt.module or ""
+                if stmt.level:
+                    parent = package.rsplit(".", stmt.level - 1)[0]
+                    source = f"{parent}.{source}" if source else parent
+                for alias in stmt.names:
+                    names[alias.asname or alias.name] = f"{source}:{alias.name}"
+            elif (
+                isinstance(stmt, ast.Assign)
+                and len(stmt.targets) == 1
+                and isinstance(stmt.targets[0], ast.Name)
+                and isinstance(stmt.value, ast.Name)
+            ):
+                names[stmt.targets[0].id] = f"{module}:{stmt.value.id}"
+        self._modules[module] = (classes, names)
+        return classes, names
+
+    @functools.cache  # noqa: B019 - the library lives as long as the process
+    def lookup(self, module: str, name: str) -> tuple[str, dict[str, Any]]:
+        """Return the class name and merged class attributes of ``module.name``."""
+        classes, names = self._module(module)
+        if name in classes:
+            cls = classes[name]
+            attrs: dict[str, Any] = {}
+            for base in cls.bases:
+                attrs = {**self.lookup(module, base)[1], **attrs}
+            return cls.name, {**attrs, **cls.attrs}
+        if name in names:
+            source, _, target = names[name].partition(":")
+            return self.lookup(source, target)
+        raise UnsupportedError(None, f"cannot resolve {module}.{name}")
+
+    def icon(self, icon_dir: str, icon: str) -> str:
+        # Same join as ``Node._load_icon``.
+        return os.path.join(self.package.parent, icon_dir, icon)  # noqa: PTH118
+
+
+def _constants(body: list[ast.stmt]) -> dict[str, Any]:
+    constants = {}
+    for stmt in body:
+        if (
+            isinstance(stmt, ast.Assign)
+            and len(stmt.targets) == 1
+            and isinstance(stmt.targets[0], ast.Name)
+        ):
+            try:
+                constants[stmt.targets[0].id] = ast.literal_eval(stmt.value)
+            except ValueError:
+                continue
+    return constants
+
+
+@functools.cache
+def _library() -> _Library:
+    return _Library()
+
+
+# ============================================================================ #
+# Lightweight models mirroring ``diagrams`` semantics and ``graphviz`` output.
+#
+
+
+class _Graph:
+    """Body of a digraph or cluster subgraph, laid out like ``graphviz``."""
+
+    def __init__(self, name: str, graph_attr: dict[str, Any]) -> None:
+        self.name = name
+        self.strict = False
+        self.graph_attr = graph_attr
+        self.node_attr: dict[str, Any] = {}
+        self.edge_attr: dict[str, Any] = {}
+        self.body: list[str] = []
+
+    def lines(self, *, subgraph: bool = False) -> list[str]:
+        name = f"{_quote(self.name)} " if self.name else ""
+        if subgraph:
+            head = f"subgraph {name}{{\n" if self.name else "{\n"
+        else:
+            head = f"{'strict ' if self.strict else ''}digraph {name}{{\n"
+        lines = [head]
+        for kind in ("graph", "node", "edge"):
+            attrs = getattr(self, f"{kind}_attr")
+            if attrs:
+                lines.append(f"\t{kind}{_attr_list(attrs)}\n")
+        return [*lines, *self.body, "}\n"]
+
+    def node(self, nodeid: str, label: str, attrs: dict[str, Any]) -> None:
+        self.body.append(f"\t{_quote(nodeid)}{_attr_list(attrs, label)}\n")
+
+    def subgraph(self, graph: _Graph) -> None:
+        self.body += [f"\t{line}" for line in graph.lines(subgraph=True)]
+
+
+class _Scope:
+    """The current diagram and cluster, like the context vars of ``diagrams``."""
+
+    def __init__(self, library: _Library) -> None:
+        self.library = library
+        self.diagram: _Diagram | None = None
+        self.cluster: _Cluster | None = None
+        self.compiled: list[Compiled] = []
+        self._ids = 0
+
+    def next_id(self) -> str:
+        # Deterministic ids keep the output stable across runs.
+        self._ids += 1
+        return uuid.UUID(int=self._ids).hex
+
+    def edge(self, node: _Node | None = None, **kwargs: Any) -> _Edge:  # noqa: ANN401
+        return _Edge(self, node, **kwargs)
+
+
+class _Diagram(_Graph):
+    def __init__(  # noqa: PLR0913
+        self,
+        scope: _Scope,
+        name: str = "",
+        filename: str = "",
+        direction: str = "LR",
+        curvestyle: str = "ortho",
+        outformat: str | list[str] = "png",
+        autolabel: bool = False,  # noqa: FBT001, FBT002
+        show: bool = True,  # noqa: ARG002, FBT001, FBT002
+        strict: bool = False,  # noqa: FBT001, FBT002
+        graph_attr: dict | None = None,
+        node_attr: dict | None = None,
+        edge_attr: dict | None = None,
+    ) -> None:
+        _, defaults = scope.library.lookup("diagrams", "Diagram")
+        if not name and not filename:
+            filename = "diagrams_image"
+        elif not filename:
+            filename = "_".join(name.split()).lower()
+        super().__init__(name, {**defaults["_default_graph_attrs"], "label": name})
+        self.scope = scope
+        self.filename = filename
+        self.strict = strict
+        self.autolabel = autolabel
+        self.nodes: list[str] = []
+        self.edges: list[Connection] = []
+        self.node_attr = dict(defaults["_default_node_attrs"])
+        self.edge_attr = dict(defaults["_default_edge_attrs"])
+        if direction.upper() not in defaults["__directions"]:
+            msg = f'"{direction}" is not a valid direction'
+            raise ValueError(msg)
+        self.graph_attr["rankdir"] = direction
+        if curvestyle.lower() not in defaults["__curvestyles"]:
+            msg = f'"{curvestyle}" is not a valid curvestyle'
+            raise ValueError(msg)
+        self.graph_attr["splines"] = curvestyle
+        for one_format in outformat if isinstance(outformat, list) else [outformat]:
+            if one_format.lower() not in defaults["__outformats"]:
+                msg = f'"{one_format}" is not a valid output format'
+                raise ValueError(msg)
+        self.graph_attr.update(graph_attr or {})
+        self.node_attr.update(node_attr or {})
+        self.edge_attr.update(edge_attr or {})
+
+    def enter(self) -> None:
+        self.scope.diagram = self
+
+    def exit(self) -> None:
+        self.scope.compiled.append(
+            Compiled(
+                self.filename,
+                "".join(self.lines()),
+                tuple(self.nodes),
+                tuple(self.edges),
+            )
+        )
+        self.scope.diagram = None
+
+    def connect(self, node: _Node, node2: _Node, edge: _Edge) -> None:
+        tail, head = _quote(node.nodeid), _quote(node2.nodeid)
+        # ``Digraph.edge`` takes the label as a named argument, so it comes first.
+        attrs = edge.attrs
+        label = attrs.pop("label", None)
+        self.body.append(f"\t{tail} -> {head}{_attr_list(attrs, label)}\n")
+        self.edges.append(Connection(node.label, node2.label, attrs["dir"]))
+
+
+class _Cluster(_Graph):
+    def __init__(
+        self,
+        scope: _Scope,
+        label: str = "cluster",
+        direction: str = "LR",
+        graph_attr: dict | None = None,
+    ) -> None:
+        _, defaults = scope.library.lookup("diagrams", "Cluster")
+        super().__init__(
+            "cluster_" + label, {**defaults["_default_graph_attrs"], "label": label}
+        )
+        if direction.upper() not in defaults["__directions"]:
+            msg = f'"{direction}" is not a valid direction'
+            raise ValueError(msg)
+        self.graph_attr["rankdir"] = direction
+        if scope.diagram is None:
+            msg = "Global diagrams context not set up"
+            raise OSError(msg)
+        self.scope = scope
+        self._diagram = scope.diagram
+        self._parent = scope.cluster
+        self.depth = self._parent.depth + 1 if self._parent else 0
+        bgcolors = defaults["__bgcolors"]
+        self.graph_attr["bgcolor"] = bgcolors[self.depth % len(bgcolors)]
+        self.graph_attr.update(graph_attr or {})
+
+    def enter(self) -> None:
+        self.scope.cluster = self
+
+    def exit(self) -> None:
+        (self._parent or self._diagram).subgraph(self)
+        self.scope.cluster = self._parent
+
+
+class _Node:
+    def __init__(  # noqa: PLR0913
+        self,
+        scope: _Scope,
+        kind: str,
+        defaults: dict[str, Any],
+        icon: str | None,
+        label: str = "",
+        *,
+        nodeid: str | None = None,
+        **attrs: Any,  # noqa: ANN401
+    ) -> None:
+        self.scope = scope
+        self._id = nodeid or scope.next_id()
+        self.label = label
+        if scope.diagram is None:
+            msg = "Global diagrams context not set up"
+            raise OSError(msg)
+        self._diagram = scope.diagram
+        if self._diagram.autolabel:
+            self.label = f"{kind}\n{self.label}" if self.label else kind
+        padding = 0.4 * (self.label.count("\n"))
+        self._attrs = (
+            {
+                "shape": "none",
+                "height": str(defaults["_height"] + padding),
+                "image": icon,
+            }
+            if icon
+            else {}
+        )
+        self._attrs.update(attrs)
+        (scope.cluster or self._diagram).node(self._id, self.label, self._attrs)
+        self._diagram.nodes.append(self.label)
+
+    @property
+    def nodeid(self) -> str:
+        return self._id
+
+    def connect(self, node: _Node, edge: _Edge) -> _Node:
+        self._diagram.connect(self, node, edge)
+        return node
+
+    # The operators below follow ``diagrams.Node`` line for line.
+
+    def __sub__(self, other: _Node | list | _Edge) -> _Node | list | _Edge:
+        if isinstance(other, list):
+            for node in other:
+                self.connect(node, self.scope.edge(self))
+            return other
+        if isinstance(other, _Node):
+            return self.connect(other, self.scope.edge(self))
+        other.node = self
+        return other
+
+    def __rsub__(self, other: list) -> _Node:
+        for o in other:
+            if isinstance(o, _Edge):
+                o.connect(self)
+            else:
+                o.connect(self, self.scope.edge(self))
+        return self
+
+    def __rshift__(self, other: _Node | list | _Edge) -> _Node | list | _Edge:
+        if isinstance(other, list):
+            for node in other:
+                self.connect(node, self.scope.edge(self, forward=True))
+            return other
+        if isinstance(other, _Node):
+            return self.connect(other, self.scope.edge(self, forward=True))
+        other.forward = True
+        other.node = self
+        return other
+
+    def __lshift__(self, other: _Node | list | _Edge) -> _Node | list | _Edge:
+        if isinstance(other, list):
+            for node in other:
+                self.connect(node, self.scope.edge(self, reverse=True))
+            return other
+        if isinstance(other, _Node):
+            return self.connect(other, self.scope.edge(self, reverse=True))
+        other.reverse = True
+        return other.connect(self)
+
+    def __rrshift__(self, other: list) -> _Node:
+        for o in other:
+            if isinstance(o, _Edge):
+                o.forward = True
+                o.connect(self)
+            else:
+                o.connect(self, self.scope.edge(self, forward=True))
+        return self
+
+    def __rlshift__(self, other: list) -> _Node:
+        for o in other:
+            if isinstance(o, _Edge):
+                o.reverse = True
+                o.connect(self)
+            else:
+                o.connect(self, self.scope.edge(self, reverse=True))
+        return self
+
+
+class _Edge:
+    def __init__(  # noqa: PLR0913
+        self,
+        scope: _Scope,
+        node: _Node | None = None,
+        forward: bool = False,  # noqa: FBT001, FBT002
+        reverse: bool = False,  # noqa: FBT001, FBT002
+        label: str = "",
+        color: str = "",
+        style: str = "",
+        **attrs: Any,  # noqa: ANN401
+    ) -> None:
+        if node is not None and not isinstance(node, _Node):
+            msg = f"{node!r} is not a Node"
+            raise TypeError(msg)
+        self.scope = scope
+        self.node = node
+        self.forward = forward
+        self.reverse = reverse
+        _, defaults = scope.library.lookup("diagrams", "Edge")
+        self._attrs = dict(defaults["_default_edge_attrs"])
+        if label:
+            self._attrs["label"] = label
+        if color:
+            self._attrs["color"] = color
+        if style:
+            self._attrs["style"] = style
+        self._attrs.update(attrs)
+
+    # The operators below follow ``diagrams.Edge`` line for line.
+
+    def __sub__(self, other: _Node | _Edge | list) -> _Node | _Edge | list:
+        return self.connect(other)
+
+    def __rsub__(self, other: list) -> list:
+        return self.append(other)
+
+    def __rshift__(self, other: _Node | _Edge | list) -> _Node | _Edge | list:
+        self.forward = True
+        return self.connect(other)
+
+    def __lshift__(self, other: _Node | _Edge | list) -> _Node | _Edge | list:
+        self.reverse = True
+        return self.connect(other)
+
+    def __rrshift__(self, other: list) -> list:
+        return self.append(other, forward=True)
+
+    def __rlshift__(self, other: list) -> list:
+        return self.append(other, reverse=True)
+
+    def append(
+        self,
+        other: list,
+        forward: bool | None = None,  # noqa: FBT001
+        reverse: bool | None = None,  # noqa: FBT001
+    ) -> list:
+        result = []
+        for o in other:
+            if isinstance(o, _Edge):
+                o.forward = forward if forward else o.forward
+                o.reverse = forward if forward else o.reverse
+                self._attrs = o.attrs.copy()
+                result.append(o)
+            else:
+                result.append(
+                    self.scope.edge(o, forward=forward, reverse=reverse, **self._attrs)
+                )
+        return result
+
+    def connect(self, other: _Node | _Edge | list) -> _Node | _Edge | list:
+        if isinstance(other, list):
+            for node in other:
+                self.node.connect(node, self)
+            return other
+        if isinstance(other, _Edge):
+            self._attrs = other._attrs.copy()  # noqa: SLF001
+            return self
+        if self.node is not None:
+            return self.node.connect(other, self)
+        self.node = other
+        return self
+
+    @property
+    def attrs(self) -> dict[str, Any]:
+        if self.forward and self.reverse:
+            direction = "both"
+        elif self.forward:
+            direction = "forward"
+        elif self.reverse:
+            direction = "back"
+        else:
+            direction = "none"
+        return {**self._attrs, "dir": direction}
+
+
+# ============================================================================ #
+# Evaluator for the subset of Python used by diagram scripts.
+#
+
+
+class _Factory:
+    """A callable the script may invoke, bound to the compilation scope."""
+
+    def __init__(self, scope: _Scope, build: Any) -> None:  # noqa: ANN401
+        self.scope = scope
+        self.build = build
+
+    def __call__(self, *args: Any, **kwargs: Any) -> Any:  # noqa: ANN401
+        return self.build(self.scope, *args, **kwargs)
+
+
+class _Partial:
+    """Stand-in for ``functools.partial``."""
+
+
+class _Return(Exception):  # noqa: N818 - control flow, not an error
+    def __init__(self, value: Any) -> None:  # noqa: ANN401
+        self.value = value
+
+
+class _Function:
+    """A helper defined in the script, such as ``nestjs(label)``."""
+
+    def __init__(
+        self, compiler: _Compiler, node: ast.FunctionDef, scope: ChainMap
+    ) -> None:
+        args = node.args
+        if args.vararg or args.kwarg or node.decorator_list:
+            raise UnsupportedError(node, "unsupported function signature")
+        self.compiler = compiler
+        self.node = node
+        self.scope = scope
+        self.params = [arg.arg for arg in [*args.posonlyargs, *args.args]]
+        self.defaults = dict(
+            zip(
+                self.params[len(self.params) - len(args.defaults) :],
+                [compiler.evaluate(default, scope) for default in args.defaults],
+                strict=True,
+            )
+        )
+        for arg, default in zip(args.kwonlyargs, args.kw_defaults, strict=True):
+            if default is not None:
+                self.defaults[arg.arg] = compiler.evaluate(default, scope)
+        self.kwonly = [arg.arg for arg in args.kwonlyargs]
+
+    def __call__(self, *args: Any, **kwargs: Any) -> Any:  # noqa: ANN401
+        if len(args) > len(self.params):
+            msg = f"{self.node.name}() got too many positional arguments"
+            raise TypeError(msg)
+        bound = {**self.defaults, **dict(zip(self.params, args, strict=False))}
+        for key, value in kwargs.items():
+            if key not in self.params and key not in self.kwonly:
+                msg = f"{self.node.name}() got an unexpected keyword argument {key!r}"
+                raise TypeError(msg)
+            bound[key] = value
+        missing = [name for name in [*self.params, *self.kwonly] if name not in bound]
+        if missing:
+            msg = f"{self.node.name}() missing arguments: {', '.join(missing)}"
+            raise TypeError(msg)
+        try:
+            self.compiler.execute(self.node.body, self.scope.new_child(bound))
+        except _Return as result:
+            return result.value
+        return None
+
+
+class _Compiler:
+    """Evaluates a diagram script's AST against the lightweight models."""
+
+    def __init__(self, library: _Library) -> None:
+        self.scope = _Scope(library)
+        self.library = library
+
+    def run(self, tree: ast.Module) -> list[Compiled]:
+        try:
+            self.execute(tree.body, ChainMap({"__name__": "__main__"}))
+        except _Return as exc:
+            raise UnsupportedError(None, "'return' outside function") from exc
+        return self.scope.compiled
+
+    # ------------------------------------------------------------------ #
+    # Statements
+
+    def execute(self, body: list[ast.stmt], scope: ChainMap) -> None:
+        for stmt in body:
+            handler = getattr(self, f"_exec_{type(stmt).__name__}", None)
+            if handler is None:
+                raise UnsupportedError(stmt, f"{type(stmt).__name__} statement")
+            handler(stmt, scope)
+
+    def _exec_Pass(self, stmt: ast.Pass, scope: ChainMap) -> None:  # noqa: N802
+        pass
+
+    def _exec_Expr(self, stmt: ast.Expr, scope: ChainMap) -> None:  # noqa: N802
+        self.evaluate(stmt.value, scope)
+
+    def _exec_Return(self, stmt: ast.Return, scope: ChainMap) -> None:  # noqa: N802
+        value = None if stmt.value is None else self.evaluate(stmt.value, scope)
+        raise _Return(value)
+
+    def _exec_Assign(self, stmt: ast.Assign, scope: ChainMap) -> None:  # noqa: N802
+        value = self.evaluate(stmt.value, scope)
+        for target in stmt.targets:
+            self._assign(target, value, scope)
+
+    def _exec_AnnAssign(self, stmt: ast.AnnAssign, scope: ChainMap) -> None:  # noqa: N802
+        if stmt.value is not None:
+            self._assign(stmt.target, self.evaluate(stmt.value, scope), scope)
+
+    def _assign(self, target: ast.expr, value: Any, scope: ChainMap) -> None:  # noqa: ANN401
+        if isinstance(target, ast.Name):
+            scope[target.id] = value
+        elif isinstance(target, ast.Tuple | ast.List):
+            values = list(value)
+            if len(values) != len(target.elts):
+                raise UnsupportedError(target, "unpacking length mismatch")
+            for element, item in zip(target.elts, values, strict=True):
+                self._assign(element, item, scope)
+        else:
+            raise UnsupportedError(target, f"assignment to {type(target).__name__}")
+
+    def _exec_If(self, stmt: ast.If, scope: ChainMap) -> None:  # noqa: N802
+        branch = stmt.body if self.evaluate(stmt.test, scope) else stmt.orelse
+        self.execute(branch, scope)
+
+    def _exec_For(self, stmt: ast.For, scope: ChainMap) -> None:  # noqa: N802
+        if stmt.orelse:
+            raise UnsupportedError(stmt, "for-else")
+        for item in self.evaluate(stmt.iter, scope):
+            self._assign(stmt.target, item, scope)
+            self.execute(stmt.body, scope)
+
+    def _exec_FunctionDef(self, stmt: ast.FunctionDef, scope: ChainMap) -> None:  # noqa: N802
+        scope[stmt.name] = _Function(self, stmt, scope)
+
+    def _exec_With(self, stmt: ast.With, scope: ChainMap) -> None:  # noqa: N802
+        contexts = []
+        for item in stmt.items:
+            context = self.evaluate(item.context_expr, scope)
+            if not isinstance(context, _Diagram | _Cluster):
+                raise UnsupportedError(item.context_expr, "unsupported context manager")
+            context.enter()
+            contexts.append(context)
+            if item.optional_vars is not None:
+                self._assign(item.optional_vars, context, scope)
+        self.execute(stmt.body, scope)
+        for context in reversed(contexts):
+            context.exit()
+
+    def _exec_ImportFrom(self, stmt: ast.ImportFrom, scope: ChainMap) -> None:  # noqa: N802
+        module = stmt.module or ""
+        for alias in stmt.names:
+            scope[alias.asname or alias.name] = self._import(stmt, module, alias.name)
+
+    def _import(self, stmt: ast.ImportFrom, module: str, name: str) -> Any:  # noqa: ANN401
+        if stmt.level == 0 and module == "functools" and name == "partial":
+            return _Partial()
+        if stmt.level or module.partition(".")[0] != "diagrams":
+            raise UnsupportedError(stmt, f"import from {module or '.'}")
+        builders = {"Diagram": _Diagram, "Cluster": _Cluster, "Group": _Cluster}
+        if module == "diagrams" and name in builders:
+            return _Factory(self.scope, builders[name])
+        if module == "diagrams" and name == "Edge":
+            return _Factory(self.scope, _Edge)
+        try:
+            kind, attrs = self.library.lookup(module, name)
+        except UnsupportedError as exc:
+            raise UnsupportedError(stmt, str(exc)) from exc
+        if module == "diagrams.custom" and kind == "Custom":
+
+            def custom(
+                scope: _Scope,
+                label: str,
+                icon_path: str,
+                *args: Any,  # noqa: ANN401
+                **kwargs: Any,  # noqa: ANN401
+            ) -> _Node:
+                return _Node(scope, kind, attrs, icon_path, label, *args, **kwargs)
+
+            return _Factory(self.scope, custom)
+        if "_height" not in attrs:
+            raise UnsupportedError(stmt, f"{module}.{name} is not a node")
+        icon = (
+            self.library.icon(attrs["_icon_dir"], attrs["_icon"])
+            if attrs.get("_icon")
+            else None
+        )
+        return _Factory(
+            self.scope, functools.partial(_node, kind=kind, attrs=attrs, icon=icon)
+        )
+
+    # ------------------------------------------------------------------ #
+    # Expressions
+
+    def evaluate(self, node: ast.expr, scope: ChainMap) -> Any:  # noqa: ANN401, C901, PLR0911
+        if isinstance(node, ast.Constant):
+            return node.value
+        if isinstance(node, ast.Name):
+            if node.id not in scope:
+                raise UnsupportedError(node, f"unknown name {node.id!r}")
+            return scope[node.id]
+        if isinstance(node, ast.List | ast.Tuple):
+            if any(isinstance(element, ast.Starred) for element in node.elts):
+                raise UnsupportedError(node, "starred expression")
+            values = [self.evaluate(element, scope) for element in node.elts]
+            return values if isinstance(node, ast.List) else tuple(values)
+        if isinstance(node, ast.Dict):
+            if any(key is None for key in node.keys):
+                raise UnsupportedError(node, "dict unpacking")
+            return {
+                self.evaluate(key, scope): self.evaluate(value, scope)
+                for key, value in zip(node.keys, node.values, strict=True)
+            }
+        if isinstance(node, ast.JoinedStr):
+            return "".join(self._format(value, scope) for value in node.values)
+        if isinstance(node, ast.BinOp) and type(node.op) in _OPERATORS:
+            left = self.evaluate(node.left, scope)
+            right = self.evaluate(node.right, scope)
+            return self._guard(node, _OPERATORS[type(node.op)], left, right)
+        if (
+            isinstance(node, ast.Compare)
+            and len(node.ops) == 1
+            and type(node.ops[0]) in _COMPARISONS
+        ):
+            left = self.evaluate(node.left, scope)
+            right = self.evaluate(node.comparators[0], scope)
+            return _COMPARISONS[type(node.ops[0])](left, right)
+        if isinstance(node, ast.Call):
+            return self._call(node, scope)
+        raise UnsupportedError(node, f"{type(node).__name__} expression")
+
+    def _format(self, node: ast.expr, scope: ChainMap) -> str:
+        if isinstance(node, ast.Constant):
+            return node.value
+        value = self.evaluate(node.value, scope)
+        if not isinstance(value, str | int | float):
+            raise UnsupportedError(node, "formatting a non-literal value")
+        if node.conversion != -1:
+            value = {115: str, 114: repr, 97: ascii}[node.conversion](value)
+        spec = (
+            "" if node.format_spec is None else self.evaluate(node.format_spec, scope)
+        )
+        return format(value, spec)
+
+    def _call(self, node: ast.Call, scope: ChainMap) -> Any:  # noqa: ANN401
+        func = self.evaluate(node.func, scope)
+        if any(isinstance(arg, ast.Starred) for arg in node.args):
+            raise UnsupportedError(node, "starred arguments")
+        args = [self.evaluate(arg, scope) for arg in node.args]
+        kwargs: dict[str, Any] = {}
+        for keyword in node.keywords:
+            value = self.evaluate(keyword.value, scope)
+            if keyword.arg is not None:
+                kwargs[keyword.arg] = value
+            elif isinstance(value, dict):
+                kwargs.update(value)
+            else:
+                raise UnsupportedError(keyword, "unpacking a non-dict")
+        if isinstance(func, _Partial):
+            if not args or not _callable(args[0]):
+                raise UnsupportedError(node, "partial of an unsupported callable")
+            return functools.partial(*args, **kwargs)
+        if not _callable(func):
+            raise UnsupportedError(node, "call to an unsupported callable")
+        return self._guard(node, func, *args, **kwargs)
+
+    @staticmethod
+    def _guard(node: ast.expr, func: Any, *args: Any, **kwargs: Any) -> Any:  # noqa: ANN401
+        """Call ``func``, turning runtime errors into a fallback to execution."""
+        try:
+            return func(*args, **kwargs)
+        except (UnsupportedError, _Return):
+            raise
+        except Exception as exc:
+            raise UnsupportedError(node, f"{type(exc).__name__}: {exc}") from exc
+
+
+def _node(
+    scope: _Scope,
+    *args: Any,  # noqa: ANN401
+    kind: str,
+    attrs: dict[str, Any],
+    icon: str | None,
+    **kwargs: Any,  # noqa: ANN401
+) -> _Node:
+    return _Node(scope, kind, attrs, icon, *args, **kwargs)
+
+
+def _callable(func: Any) -> bool:  # noqa: ANN401
+    if isinstance(func, functools.partial):
+        return _callable(func.func)
+    return isinstance(func, _Factory | _Function)
+
+
+# ============================================================================ #
+
+
+def compile_script(path: str | os.PathLike) -> list[Compiled]:
+    """Compile a diagram script to DOT without importing ``diagrams``.
+
+    :raises UnsupportedError: If the script uses anything the compiler cannot
+        evaluate statically.
+    """
+    source = Path(path).read_text(encoding="utf-8")
+    try:
+        tree = ast.parse(source, filename=str(path))
+    except SyntaxError as exc:
+        raise UnsupportedError(None, f"syntax error: {exc.msg}") from exc
+    return _Compiler(_library()).run(tree)
+
+
+def execute_script(path: str | os.PathLike) -> list[Compiled]:
+    """Run a diagram script normally, capturing its DOT instead of rendering."""
+    from diagrams import (  # noqa: PLC0415 - fallback only
+        Cluster,
+        Diagram,
+        Edge,
+        Node,
+        setdiagram,
+    )
+
+    compiled: list[Compiled] = []
+    nodes: dict[int, list[str]] = {}
+    edges: dict[int, list[Connection]] = {}
+    original = {
+        (Diagram, "__exit__"): Diagram.__exit__,
+        (Diagram, "node"): Diagram.node,
+        (Diagram, "connect"): Diagram.connect,
+        (Cluster, "node"): Cluster.node,
+    }
+
+    def diagram_exit(diagram: Diagram, *_: object) -> None:
+        # Unlike ``Diagram.__exit__``, neither render nor write the source, which
+        # would also create the output directories.
+        setdiagram(None)
+        compiled.append(
+            Compiled(
+                diagram.filename,
+                diagram.dot.source,
+                tuple(nodes.pop(id(diagram), [])),
+                tuple(edges.pop(id(diagram), [])),
+            )
+        )
+
+    def diagram_node(diagram: Diagram, nodeid: str, label: str, **attrs: Any) -> None:  # noqa: ANN401
+        nodes.setdefault(id(diagram), []).append(label)
+        original[Diagram, "node"](diagram, nodeid, label, **attrs)
+
+    def cluster_node(cluster: Cluster, nodeid: str, label: str, **attrs: Any) -> None:  # noqa: ANN401
+        nodes.setdefault(id(cluster._diagram), []).append(label)  # noqa: SLF001
+        original[Cluster, "node"](cluster, nodeid, label, **attrs)
+
+    def connect(diagram: Diagram, node: Node, node2: Node, edge: Edge) -> None:
+        direction = edge.attrs["dir"]
+        connection = Connection(node.label, node2.label, direction)
+        edges.setdefault(id(diagram), []).append(connection)
+        original[Diagram, "connect"](diagram, node, node2, edge)
+
+    Diagram.__exit__ = diagram_exit
+    Diagram.node = diagram_node
+    Diagram.connect = connect
+    Cluster.node = cluster_node
+    try:
+        runpy.run_path(str(path), run_name="__main__")
+    finally:
+        for (cls, name), method in original.items():
+            setattr(cls, name, method)
+    return compiled
+
+
+def to_dot(path: str | os.PathLike, *, fallback: bool = True) -> list[Compiled]:
+    """Compile ``path`` statically, falling back to executing it if needed."""
+    try:
+        return compile_script(path)
+    except UnsupportedError:
+        if not fallback:
+            raise
+        return execute_script(path)
+
+
+def main(argv: list[str] | None = None) -> int:
+    """Print the DOT source of every diagram declared by a script."""
+    parser = argparse.ArgumentParser(description=main.__doc__)
+    parser.add_argument("script", type=Path, help="diagram script, e.g. payment.py")
+    parser.add_argument(
+        "--no-fallback",
+        action="store_true",
+        help="fail instead of executing scripts that cannot be compiled statically",
+    )
+    args = parser.parse_args(argv)
+    try:
+        compiled = compile_script(args.script)
+    except UnsupportedError as exc:
+        where = f"{args.script}:{exc.lineno}" if exc.lineno else str(args.script)
+        sys.stderr.write(f"{where}: {exc}\n")
+        if args.no_fallback:
+            return 1
+        compiled = execute_script(args.script)
+    for diagram in compiled:
+        sys.stdout.write(diagram.source)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
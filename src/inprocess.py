@@ -0,0 +1,162 @@
+from __future__ import annotations  # noqa: INP001
+
+import os
+import threading
+from pathlib import Path
+from typing import TYPE_CHECKING
+
+from diagrams import Diagram, setdiagram
+
+try:
+    import pygraphviz
+    from pygraphviz import graphviz as gv
+except ImportError:  # pragma: no cover - depends on the environment
+    pygraphviz = None
+    gv = None
+
+if TYPE_CHECKING:
+    from types import TracebackType
+    from typing import Self
+
+
+class Renderer:
+    """A reusable libgvc context that renders DOT sources to bytes.
+
+    Parsing, layout and rendering happen in-process through the ``pygraphviz``
+    binding, so no ``dot`` process is spawned and no temporary file is
+    written. The context is not thread-safe, so renders are serialized.
+    """
+
+    def __init__(self, engine: str = "dot") -> None:
+        """Create the GVC context used by every subsequent render."""
+        if gv is None:
+            msg = "pygraphviz is required for in-process rendering"
+            raise ImportError(msg)
+        self.engine = engine
+        # pygraphviz >= 2 wheels bundle graphviz with its plugins built in.
+        context = getattr(gv, "gvContextWithBuiltins", gv.gvContext)
+        self._gvc = context()
+        self._lock = threading.Lock()
+
+    def __enter__(self) -> Self:  # noqa: D105
+        return self
+
+    def __exit__(  # noqa: D105
+        self,
+        exc_type: type[BaseException] | None,
+        exc_value: BaseException | None,
+        traceback: TracebackType | None,
+    ) -> None:
+        self.close()
+
+    def close(self) -> None:
+        """Release the GVC context."""
+        if self._gvc is not None:
+            gv.gvFreeContext(self._gvc)
+            self._gvc = None
+
+    def render(self, source: str, outformat: str = "png") -> bytes:
+        """Lay out ``source`` and return the rendered ``outformat`` bytes."""
+        with self._lock:
+            if self._gvc is None:
+                msg = "renderer is closed"
+                raise RuntimeError(msg)
+            # cgraph's parser keeps global state too, so parsing is serialized.
+            graph = _parse(source)
+            if gv.gvLayout(self._gvc, graph.handle, self.engine.encode()):
+                msg = f'graphviz layout with "{self.engine}" failed'
+                raise ValueError(msg)
+            try:
+                err, data = gv.gvRenderData(self._gvc, graph.handle, outformat.encode())
+            finally:
+                gv.gvFreeLayout(self._gvc, graph.handle)
+        if err:
+            msg = f'graphviz could not render "{outformat}"'
+            raise ValueError(msg)
+        return data
+
+
+def _parse(source: str) -> pygraphviz.AGraph:
+    """Parse a DOT source from memory, so no temporary file is written."""
+    graph = pygraphviz.AGraph()
+    if not hasattr(os, "memfd_create"):  # pragma: no cover - Linux only
+        return graph.from_string(source)
+    # agread blocks on its file without releasing the GIL, so the source cannot
+    # be fed through a pipe by another thread; it is written whole beforehand.
+    with os.fdopen(os.memfd_create("dot"), "w+b") as fh:
+        fh.write(source.encode())
+        fh.seek(0)
+        graph.read(fh)
+    return graph
+
+
+_renderer: Renderer | None = None
+
+
+def get_renderer() -> Renderer:
+    """Return the process-wide renderer, creating it on first use."""
+    global _renderer  # noqa: PLW0603
+    if _renderer is None:
+        _renderer = Renderer()
+    return _renderer
+
+
+class InProcessDiagram(Diagram):
+    """A ``Diagram`` rendered in-process by a shared :class:`Renderer`.
+
+    Meant for bulk generation of many small views, where spawning ``dot`` for
+    each one costs more than the layout itself::
+
+        with InProcessDiagram("Team view", filename="result/team", save=False) as d:
+            ...
+        png = d.output["png"]
+
+    The rendered images are kept in :attr:`output`, keyed by format, and are
+    written next to ``filename`` only when ``save`` is true. ``show`` is
+    ignored since no viewer is launched. Requires the optional ``pygraphviz``.
+    """
+
+    def __init__(
+        self,
+        *args: object,
+        save: bool = True,
+        renderer: Renderer | None = None,
+        **kwargs: object,
+    ) -> None:
+        """Create the diagram; extra arguments are those of ``Diagram``."""
+        super().__init__(*args, **kwargs)
+        self.save = save
+        self.renderer = renderer
+        self.output: dict[str, bytes] = {}
+
+    def __exit__(
+        self,
+        exc_type: type[BaseException] | None,
+        exc_value: BaseException | None,
+        traceback: TracebackType | None,
+    ) -> None:
+        """Render the diagram; unlike ``Diagram`` no DOT file is left behind."""
+        try:
+            self.render()
+        finally:
+            setdiagram(None)
+
+    def render(self) -> None:
+        """Render every requested format into :attr:`output`."""
+        renderer = self.renderer or get_renderer()
+        target = Path(self.filename)
+        # ``dot`` runs inside the output directory, so relative icon paths
+        # such as "../icons/nest.png" must resolve against it here as well.
+        self.dot.graph_attr.setdefault("imagepath", str(target.parent.resolve()))
+        outformats = (
+            self.outformat if isinstance(self.outformat, list) else [self.outformat]
+        )
+        source = self.dot.source
+        if self.save:
+            # As graphviz does when saving the DOT file of a plain Diagram.
+            target.parent.mkdir(parents=True, exist_ok=True)
+        for outformat in outformats:
+            data = renderer.render(source, outformat)
+            self.output[outformat] = data
+            if self.save:
+                target.with_name(f"{target.name}.{outformat}").write_bytes(data)
@@ -0,0 +1,211 @@
+import gzip
+from collections import Counter
+from pathlib import Path
+
+import pytest
+
+from drift import (
+    Observed,
+    _chunks,
+    _lines,
+    _parse_kafka,
+    _parse_kong,
+    _parse_nginx,
+    compare,
+    main,
+    observe,
+)
+from fastdot import Connection, compile_script
+
+SRC = Path(__file__).resolve().parents[1] / "src"
+
+LOG = (
+    b"".join(b"%d %s\n" % (i, b"x" * (i * 7 % 23)) for i in range(40))
+    + b"\n\nlast line"
+)
+
+
+@pytest.mark.parametrize("data", [LOG, LOG + b"\n"], ids=["no_newline", "newline"])
+def test_chunks_give_back_the_original_bytes(data: bytes, tmp_path: Path) -> None:
+    path = tmp_path / "access.log"
+    path.write_bytes(data)
+    for chunk_size in range(1, len(data) + 2):
+        chunks = list(_chunks("nginx", path, chunk_size))
+        assert b"".join(line for chunk in chunks for line in _lines(chunk)) == data
+
+
+def test_gzipped_logs_are_read_whole(tmp_path: Path) -> None:
+    path = tmp_path / "access.log.gz"
+    path.write_bytes(gzip.compress(LOG))
+    chunks = list(_chunks("nginx", path, 1))
+    assert len(chunks) == 1
+    assert b"".join(_lines(chunks[0])) == LOG
+
+
+@pytest.mark.parametrize(
+    ("line", "pairs"),
+    [
+        (
+            b'{"service":{"host":"a","name":"orders"},"consumer":{"username":"web"}}',
+            [("web", None), (None, "orders")],
+        ),
+        (
+            b'{"service": {"host": "a", "name" : "orders"}, "latencies": {}}',
+            [(None, "orders")],
+        ),
+        (
+            (
+                b'{"service":{"client_certificate":{"id":"1","name":"cert",'
+                b'"tags":{"a":{"name":"x"}}},"name":"orders"}}'
+            ),
+            [(None, "orders")],
+        ),
+        (b'{"service":{"name":"say \\"hi\\""}}', [(None, 'say "hi"')]),
+        (b'{"service":{"name":"caf\xe9"}}', [(None, "caf\ufffd")]),
+        (b'{"request":{"uri":"/"},"service":null,"consumer":null}', []),
+        (b'{"service":{"name":"orders"', None),
+        (b'["service"]', None),
+    ],
+    ids=[
+        "compact",
+        "spaced",
+        "nested",
+        "escaped_quote",
+        "invalid_utf8",
+        "no_service",
+        "truncated",
+        "not_an_object",
+    ],
+)
+def test_parse_kong(line: bytes, pairs: list | None) -> None:
+    assert _parse_kong(line) == pairs
+
+
+@pytest.mark.parametrize(
+    ("line", "pairs"),
+    [
+        (
+            (
+                b'10.0.0.1 - - [19/Oct/2026:10:00:00 +0000] "GET / HTTP/1.1" 200 5 '
+                b'"-" "curl" 80 0.002 [prod-keycloak-8080] [] 10.1.0.4:8080 5 0.002 '
+                b"200 id"
+            ),
+            [(None, "prod-keycloak-8080")],
+        ),
+        (
+            (
+                b'10.0.0.1 - - [19/Oct/2026:10:00:00 +0000] "GET / HTTP/1.1" 308 5 '
+                b'"-" "curl" 80 0.000 [-] [] - - - - id'
+            ),
+            [],
+        ),
+        (b"2026/10/19 10:00:00 [error] 12#12: upstream timed out", None),
+    ],
+    ids=["upstream", "no_upstream", "error_log"],
+)
+def test_parse_nginx(line: bytes, pairs: list | None) -> None:
+    assert _parse_nginx(line) == pairs
+
+
+@pytest.mark.parametrize(
+    ("line", "pairs"),
+    [
+        (b"GROUP    TOPIC   PARTITION  CURRENT-OFFSET  LOG-END-OFFSET  LAG", []),
+        (
+            b"payment  orders  3          120             120             0",
+            [("payment", None)],
+        ),
+        (b"Consumer group 'idle' has no active members.", []),
+        (b"Error: Executing consumer group command failed", None),
+    ],
+    ids=["header", "row", "note", "error"],
+)
+def test_parse_kafka(line: bytes, pairs: list | None) -> None:
+    assert _parse_kafka(line) == pairs
+
+
+def test_observe_counts_skipped_lines(tmp_path: Path) -> None:
+    path = tmp_path / "kong.log"
+    path.write_bytes(
+        b'{"service":{"name":"orders"}}\n\nnot json\n{"service": {"name": "orders"}}\n'
+    )
+    observation = observe([("kong", path)], jobs=1, chunk_size=16)
+    assert observation.counts == Counter({("kong", None, "orders"): 2})
+    assert observation.skipped == Counter({"kong": 1})
+
+
+HUBS = {"kong": "Kong", "nginx": "Ingress", "kafka": "Broker 01"}
+
+
+def test_compare_reports_missing_extra_and_unused() -> None:
+    nodes = ["Ingress", "Kong", "Orders", "Payment", "Broker 01", "Broker 02"]
+    edges = [
+        Connection("Ingress", "Kong", "forward"),
+        Connection("Kong", "Orders", "forward"),
+        Connection("Kong", "Payment", "forward"),
+        Connection("Orders", "Broker 01", "forward"),
+        Connection("Broker 01", "Broker 02", "none"),
+    ]
+    counts = Counter(
+        {
+            ("nginx", None, "prod-kong-8000"): 5,
+            ("kong", None, "orders"): 4,
+            ("kong", None, "legacy"): 2,
+            ("nginx", None, "prod-orders-80"): 1,
+            ("kafka", "orders", None): 3,
+        }
+    )
+    report = compare(nodes, edges, counts, HUBS)
+    assert report.missing == [Observed("Ingress", "Orders", 1)]
+    assert report.extra == [Observed("Kong", "legacy", 2)]
+    assert report.unused == [Connection("Kong", "Payment", "forward")]
+
+
+def test_compare_strips_prefixes_of_nginx_names_only() -> None:
+    nodes = ["Ingress", "Kong", "Orders"]
+    edges = [
+        Connection("Ingress", "Orders", "forward"),
+        Connection("Kong", "Orders", "forward"),
+    ]
+    counts = Counter(
+        {("nginx", None, "prod-orders-80"): 1, ("kong", None, "prod-orders-80"): 1}
+    )
+    report = compare(nodes, edges, counts, HUBS)
+    assert report.missing == []
+    assert report.extra == [Observed("Kong", "prod-orders-80", 1)]
+
+
+def test_compare_against_arquitetura(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    pytest.importorskip("diagrams")
+    monkeypatch.chdir(tmp_path)
+    (compiled,) = compile_script(SRC / "arquitetura.py")
+    producers = [edge for edge in compiled.edges if edge.head == "Broker 01"]
+    counts = Counter({("kafka", edge.tail, None): 1 for edge in producers[1:]})
+
+    report = compare(compiled.nodes, compiled.edges, counts, HUBS)
+    assert report.shared == {"Faturamento": 2, "Pajé": 2, "Telegram": 2}
+    # Broker 01 - Broker 02/03 are drawn without a direction from Broker 01,
+    # whose consumer groups only show its incoming edges.
+    assert report.unused == [producers[0]]
+    assert report.missing == report.extra == []
+
+
+def test_compare_rejects_unknown_hubs() -> None:
+    counts = Counter({("kong", None, "orders"): 1})
+    with pytest.raises(ValueError, match="'API Gateway' is not a node"):
+        compare(["Kong", "Orders"], [], counts, {**HUBS, "kong": "API Gateway"})
+
+
+def test_main_rejects_unknown_hubs(
+    tmp_path: Path, capsys: pytest.CaptureFixture[str]
+) -> None:
+    pytest.importorskip("diagrams")
+    log = tmp_path / "kong.log"
+    log.write_bytes(b'{"service":{"name":"payment"}}\n')
+    argv = [str(SRC / "arquitetura.py"), "--kong", str(log)]
+    with pytest.raises(SystemExit) as exited:
+        main([*argv, "--kong-node", "API Gateway"])
+    assert exited.value.code == 2  # noqa: PLR2004 - argparse usage error
+    assert "--kong-node 'API Gateway' is not a node" in capsys.readouterr().err
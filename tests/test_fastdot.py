@@ -0,0 +1,118 @@
+import re
+import textwrap
+from pathlib import Path
+
+import pytest
+
+pytest.importorskip("diagrams")
+
+from fastdot import UnsupportedError, compile_script, execute_script
+
+SRC = Path(__file__).resolve().parents[1] / "src"
+
+# diagrams ids are random uuid4 hex strings, quoted when they start with a digit.
+_NODE_ID = re.compile(r'"?\b[0-9a-f]{32}\b"?')
+
+
+def normalize(source: str) -> str:
+    """Replace node ids by their order of appearance."""
+    ids: dict[str, str] = {}
+    return _NODE_ID.sub(
+        lambda match: ids.setdefault(match.group().strip('"'), f"n{len(ids)}"),
+        source,
+    )
+
+
+def assert_parity(script: Path) -> None:
+    static = compile_script(script)
+    executed = execute_script(script)
+    assert [c.filename for c in static] == [c.filename for c in executed]
+    assert [normalize(c.source) for c in static] == [
+        normalize(c.source) for c in executed
+    ]
+    assert [c.nodes for c in static] == [c.nodes for c in executed]
+    assert [c.edges for c in static] == [c.edges for c in executed]
+
+
+@pytest.mark.parametrize("name", ["payment.py", "arquitetura.py"])
+def test_repository_scripts_match_execution(
+    name: str, tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    monkeypatch.chdir(tmp_path)
+    assert_parity(SRC / name)
+    # Neither path renders or saves anything, so no "result" directory either.
+    assert list(tmp_path.iterdir()) == []
+
+
+HEADER = """\
+from functools import partial
+from diagrams import Cluster, Diagram, Edge
+from diagrams.onprem.network import Kong, Nginx
+from diagrams.onprem.queue import Kafka
+from diagrams.custom import Custom
+
+Rest = partial(Edge, color="dodgerblue", label="rest")
+"""
+
+SNIPPETS = {
+    "list_edge_node": """
+        with Diagram("t", show=False):
+            a, b, c = Kong("a"), Nginx("b"), Kafka("c")
+            [a, b] >> Rest(minlen="2") >> c
+    """,
+    "lshift": """
+        with Diagram("t", show=False):
+            a, b = Kong("a"), Nginx("b")
+            a << Edge(style="bold") << b
+            a << [b]
+            [a] << b
+    """,
+    "sub": """
+        with Diagram("t", show=False):
+            a, b, c = Kong("a"), Nginx("b"), Kafka("c")
+            a - b
+            a - Rest() - [b, c]
+            [a, b] - Edge() - c
+    """,
+    "nested_cluster": """
+        with Diagram("t", show=False, direction="TB"):
+            with Cluster("outer"):
+                a = Kong("a")
+                with Cluster("inner", graph_attr={"minwidth": "1"}):
+                    b = Custom("b", "icons/b.png")
+            a >> Edge(lhead="cluster_inner") >> b
+    """,
+    "autolabel": """
+        def helper(label, *, suffix="!"):
+            return Kong(f"{label}{suffix}")
+
+        with Diagram("t", show=False, autolabel=True, strict=True):
+            for name in ["x", "y"]:
+                helper(name) >> Kafka()
+    """,
+}
+
+
+@pytest.mark.parametrize("name", SNIPPETS)
+def test_operators_match_execution(
+    name: str, tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    monkeypatch.chdir(tmp_path)
+    script = tmp_path / f"{name}.py"
+    script.write_text(HEADER + textwrap.dedent(SNIPPETS[name]), encoding="utf-8")
+    assert_parity(script)
+
+
+@pytest.mark.parametrize(
+    ("body", "lineno"),
+    [
+        ("with Diagram('t', show=False):\n    [Kong(n) for n in 'ab']\n", 10),
+        ("import os\n", 9),
+    ],
+)
+def test_unsupported_constructs(body: str, lineno: int, tmp_path: Path) -> None:
+    script = tmp_path / "script.py"
+    script.write_text(HEADER + "\n" + body, encoding="utf-8")
+    with pytest.raises(UnsupportedError) as error:
+        compile_script(script)
+    assert error.value.lineno == lineno
@@ -0,0 +1,72 @@
+from collections.abc import Iterator
+import threading
+from pathlib import Path
+
+import pytest
+
+pytest.importorskip("diagrams")
+pytest.importorskip("pygraphviz")
+
+from diagrams.onprem.network import Kong, Nginx
+
+from inprocess import InProcessDiagram, Renderer
+
+
+@pytest.fixture
+def renderer() -> Iterator[Renderer]:
+    with Renderer() as renderer:
+        yield renderer
+
+
+def test_render_returns_the_image(renderer: Renderer) -> None:
+    svg = renderer.render("digraph{a->b}", "svg")
+    assert svg.startswith((b"<?xml", b"<svg"))
+
+
+def test_renders_reuse_the_context(renderer: Renderer) -> None:
+    context = renderer._gvc  # noqa: SLF001 - the context is what is reused
+    first = renderer.render("digraph{a->b}", "svg")
+    assert renderer.render("digraph{a->b}", "svg") == first
+    assert renderer._gvc is context  # noqa: SLF001
+
+
+def test_render_after_close() -> None:
+    renderer = Renderer()
+    renderer.close()
+    with pytest.raises(RuntimeError, match="closed"):
+        renderer.render("digraph{a->b}", "svg")
+
+
+def test_invalid_source(renderer: Renderer) -> None:
+    threads = threading.active_count()
+    with pytest.raises(ValueError, match="Invalid Input"):
+        renderer.render("digraph{a->", "svg")
+    assert threading.active_count() == threads
+    # The renderer stays usable after a parse error.
+    assert renderer.render("digraph{a->b}", "svg").startswith((b"<?xml", b"<svg"))
+
+
+def test_diagram_kept_in_memory(
+    renderer: Renderer, tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    monkeypatch.chdir(tmp_path)
+    with InProcessDiagram(
+        "t",
+        filename="result/t",
+        outformat=["png", "svg"],
+        save=False,
+        renderer=renderer,
+    ) as diagram:
+        Kong("a") >> Nginx("b")
+    assert diagram.output["png"].startswith(b"\x89PNG")
+    assert diagram.output["svg"].startswith((b"<?xml", b"<svg"))
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_diagram_saved_into_a_new_directory(
+    renderer: Renderer, tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    monkeypatch.chdir(tmp_path)
+    with InProcessDiagram("t", filename="result/t", renderer=renderer) as diagram:
+        Kong("a") >> Nginx("b")
+    assert (tmp_path / "result" / "t.png").read_bytes() == diagram.output["png"]